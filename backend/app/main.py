@@ -3,8 +3,10 @@ SkillLens FastAPI Application
 Main entry point for the backend API.
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from contextlib import asynccontextmanager
 import logging
 
@@ -42,12 +44,18 @@ async def lifespan(app: FastAPI):
     if not all(api_key_status.values()):
         logger.warning("Some API keys are missing. Check .env file.")
     
+    # Build and cache the OpenAPI schema now rather than on the first docs request
+    app.openapi()
+    
     logger.info("SkillLens backend started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down SkillLens backend...")
+    from app.services.skill_verification import close_openai_client
+    
+    await close_openai_client()
     await PostgreSQL.disconnect()
     logger.info("Disconnected from PostgreSQL database")
     logger.info("SkillLens backend shut down successfully")
@@ -61,6 +69,50 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+class UnhandledErrorMiddleware:
+    """
+    Translate unhandled errors into a 500 response.
+    
+    Plain ASGI rather than @app.middleware("http"), which would add a
+    BaseHTTPMiddleware hop to every request.
+    """
+    
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # Too late for a clean 500 once headers are out; let the server handle it
+            if response_started:
+                raise
+            logger.exception("Unhandled error on %s %s", scope["method"], scope["path"])
+            # Only expose exception details in debug mode
+            detail = f"Error: {exc}" if settings.debug else "Internal server error"
+            response = ORJSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={"detail": detail}
+            )
+            await response(scope, receive, send)
+
+
+# Added before CORS so CORSMiddleware wraps it and 500s keep their
+# CORS headers (an Exception handler would run outside CORS).
+app.add_middleware(UnhandledErrorMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
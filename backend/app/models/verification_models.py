@@ -2,8 +2,8 @@
 Pydantic models for skill verification.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Any, List, Optional, Dict, Tuple
 from datetime import datetime
 from enum import Enum
 
@@ -32,7 +32,7 @@ class Question(BaseModel):
     question_text: str
     question_type: QuestionType
     difficulty: DifficultyLevel
-    options: Optional[List[str]] = None  # For multiple choice
+    options: Optional[Tuple[str, ...]] = None  # For multiple choice
     correct_answer: str
     explanation: str
     points: int = 10
@@ -45,12 +45,18 @@ class AssessmentRequest(BaseModel):
     skill: str
     difficulty: DifficultyLevel = DifficultyLevel.INTERMEDIATE
     num_questions: int = Field(default=5, ge=1, le=20)
+    
+    class Config:
+        frozen = True  # Immutable and hashable, so requests can key caches
 
 
 class MockTestRequest(BaseModel):
     """Request to generate comprehensive mock test."""
     user_id: str
     primary_skill: str
+    
+    class Config:
+        frozen = True
 
 
 class AssessmentResponse(BaseModel):
@@ -61,6 +67,9 @@ class AssessmentResponse(BaseModel):
     total_points: int
     time_limit_minutes: int
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Per-question graders in question order, built on first grading
+    _graders: Optional[Tuple[Any, ...]] = PrivateAttr(default=None)
 
 
 class AnswerSubmission(BaseModel):
@@ -73,7 +82,9 @@ class AssessmentSubmission(BaseModel):
     """Complete assessment submission."""
     assessment_id: str
     user_id: str
-    answers: List[AnswerSubmission]
+    # No assessment or mock test has more than 50 questions; an empty list
+    # (nothing answered) is graded as a blank submission
+    answers: List[AnswerSubmission] = Field(..., max_length=50)
 
 
 class AssessmentResult(BaseModel):
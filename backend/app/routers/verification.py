@@ -3,135 +3,224 @@ Verification API Router
 Endpoints for skill verification assessments.
 """
 
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+from typing import Annotated, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import Field
 
 from app.models.verification_models import (
     AssessmentRequest, AssessmentResponse,
     AssessmentSubmission, AssessmentResult, MockTestRequest
 )
-from app.services.skill_verification import get_verification_service
+from app.services.skill_verification import SkillVerificationService, get_verification_service
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Generated assessments, keyed by assessment_id, so submissions are graded
+# against the questions that were actually served. Bounded to cap memory.
+_ASSESSMENT_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+
+# Recent results keyed by (user_id, assessment_id): retried submissions get
+# the original result, and concurrent duplicates share one in-flight grading.
+_RESULT_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=600)
+_INFLIGHT_RESULTS: Dict[Tuple[str, str], "asyncio.Task[AssessmentResult]"] = {}
+
+# Template for cache-miss mock-test regeneration; copied per submission
+# instead of re-validating a fresh request each time.
+_REGENERATE_REQUEST = MockTestRequest.model_construct(user_id="", primary_skill="Python") # Default skill
+
+# Most assessments generated in one batch call
+MAX_BATCH_ASSESSMENTS = 10
+
+# The health payload never changes, so serialize it once at import.
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "service": "Skill Verification",
+    "features": [
+        "AI-Generated Assessments",
+        "Multiple Question Types",
+        "Confidence Scoring",
+        "Detailed Feedback"
+    ]
+})
+
 
-router = APIRouter()
+async def _service() -> SkillVerificationService:
+    """Shared verification service (async so FastAPI skips the threadpool)."""
+    return get_verification_service()
+
+
+async def _load_assessment(
+    assessment_id: str,
+    service: SkillVerificationService
+) -> Optional[AssessmentResponse]:
+    """Find an assessment in the local cache, falling back to the database."""
+    assessment = _ASSESSMENT_CACHE.get(assessment_id)
+    if assessment is None:
+        assessment = await service.get_assessment(assessment_id)
+        if assessment is not None:
+            _ASSESSMENT_CACHE[assessment_id] = assessment
+    return assessment
+
+
+async def _submit_once(
+    submission: AssessmentSubmission,
+    grade: Callable[[], Awaitable[AssessmentResult]]
+) -> AssessmentResult:
+    """Grade a submission at most once per (user_id, assessment_id)."""
+    key = (submission.user_id, submission.assessment_id)
+    cached = _RESULT_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    task = _INFLIGHT_RESULTS.get(key)
+    if task is None:
+        task = asyncio.create_task(grade())
+        _INFLIGHT_RESULTS[key] = task
+        task.add_done_callback(lambda t: _finish_submission(key, t))
+    # Shield so one disconnecting client does not cancel the shared grading
+    return await asyncio.shield(task)
+
+
+def _finish_submission(key: Tuple[str, str], task: "asyncio.Task[AssessmentResult]") -> None:
+    """Retire an in-flight grading, caching its result on success."""
+    _INFLIGHT_RESULTS.pop(key, None)
+    if not task.cancelled() and task.exception() is None:
+        _RESULT_CACHE[key] = task.result()
 
 
 @router.post("/generate-assessment", response_model=AssessmentResponse)
-async def generate_assessment(request: AssessmentRequest):
+async def generate_assessment(
+    request: AssessmentRequest,
+    background_tasks: BackgroundTasks,
+    service: SkillVerificationService = Depends(_service)
+):
     """
     Generate an AI-powered skill assessment.
     
     Creates a customized assessment with multiple-choice and theoretical
     questions based on the skill and difficulty level.
     """
-    try:
-        service = get_verification_service()
+    assessment = await service.generate_assessment(request)
+    _ASSESSMENT_CACHE[assessment.assessment_id] = assessment
+    # Persist after the response is sent; the cache serves submissions meanwhile
+    background_tasks.add_task(service.save_assessment, assessment, request.user_id, request.difficulty.value)
+    return assessment
+
+
+@router.post("/generate-assessment/batch", response_model=List[AssessmentResponse])
+async def generate_assessment_batch(
+    # Bounded in the type so oversized batches are rejected before item validation
+    requests: Annotated[
+        List[AssessmentRequest],
+        Field(min_length=1, max_length=MAX_BATCH_ASSESSMENTS)
+    ],
+    background_tasks: BackgroundTasks,
+    service: SkillVerificationService = Depends(_service)
+):
+    """
+    Generate several skill assessments in one call.
+    
+    Assessments are returned in request order.
+    """
+    assessments = []
+    for request in requests:
+        # Template generation never awaits, so there is nothing to overlap
         assessment = await service.generate_assessment(request)
-        return assessment
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating assessment: {str(e)}"
-        )
+        _ASSESSMENT_CACHE[assessment.assessment_id] = assessment
+        background_tasks.add_task(service.save_assessment, assessment, request.user_id, request.difficulty.value)
+        assessments.append(assessment)
+    return assessments
 
 
 @router.post("/submit-assessment", response_model=AssessmentResult)
-async def submit_assessment(submission: AssessmentSubmission):
+async def submit_assessment(
+    submission: AssessmentSubmission,
+    service: SkillVerificationService = Depends(_service)
+):
     """
     Submit assessment answers for evaluation.
     
     Evaluates the user's answers and returns score, confidence level,
     and detailed feedback.
     """
-    try:
-        service = get_verification_service()
-        
-        # In a real app, retrieve from DB. For now, we regenerate to get the "correct" answers
-        # This is a hack for the prototype since we don't have persistence
-        # We need to know the skill and difficulty from somewhere, but assessment_id isn't stored.
-        # Ideally, we'd look up the assessment by ID.
-        # For now, we'll assume a default or extracted from the submission if possible (but submission only has answers)
-        # WORKAROUND: We will assume Python/Intermediate for the prototype if we can't look it up.
-        
-        # However, looking at the code, we can't easily reconstruct the exact questions without the seed/ID mapping.
-        # But wait, generate_assessment uses standard templates.
-        # If we just want to verify "correctness" of the answers provided:
-        
-        # Let's fallback to a simpler approach:
-        # We will create a dummy request to generate matching questions
-        # This is strictly a simulation for demonstration purposes.
-        
-        req = AssessmentRequest(
-            user_id=submission.user_id,
-            skill="Python", # Defaulting to Python for demo
-            difficulty=DifficultyLevel.INTERMEDIATE,
-            num_questions=len(submission.answers)
-        )
-        
-        # Generate assessment to get correct answers
-        assessment = await service.generate_assessment(req)
-        
-        # Override ID to match submission
-        assessment.assessment_id = submission.assessment_id
-        
-        result = await service.evaluate_assessment(submission, assessment)
-        return result
-        
-    except Exception as e:
+    if await _load_assessment(submission.assessment_id, service) is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error submitting assessment: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment not found or expired"
         )
+    
+    return await _submit_once(submission, lambda: _grade_assessment(submission, service))
 
 
+# Kept async: FastAPI calls non-awaiting async handlers inline on the event
+# loop, while a plain def would be dispatched to the threadpool.
 @router.get("/health")
 async def verification_health_check():
     """Health check for verification service."""
-    return {
-        "status": "healthy",
-        "service": "Skill Verification",
-        "features": [
-            "AI-Generated Assessments",
-            "Multiple Question Types",
-            "Confidence Scoring",
-            "Detailed Feedback"
-        ]
-    }
+    return Response(
+        content=_HEALTH_BYTES,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=60"}
+    )
 
 @router.post("/mock-test/generate", response_model=AssessmentResponse)
-async def generate_mock_test(request: MockTestRequest):
+async def generate_mock_test(
+    request: MockTestRequest,
+    background_tasks: BackgroundTasks,
+    service: SkillVerificationService = Depends(_service)
+):
     """
     Generate a comprehensive 20-question mock test.
     """
-    try:
-        service = get_verification_service()
-        assessment = await service.generate_mock_test(request)
-        return assessment
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating mock test: {str(e)}"
-        )
+    assessment = await service.generate_mock_test(request)
+    _ASSESSMENT_CACHE[assessment.assessment_id] = assessment
+    background_tasks.add_task(service.save_assessment, assessment, request.user_id, "mixed")
+    # Serialize once on the event loop, skipping response_model re-validation
+    return ORJSONResponse(assessment.model_dump(mode="json"))
 
 
 @router.post("/mock-test/submit", response_model=AssessmentResult)
-async def submit_mock_test(submission: AssessmentSubmission):
+async def submit_mock_test(
+    submission: AssessmentSubmission,
+    service: SkillVerificationService = Depends(_service)
+):
     """
     Submit mock test answers for evaluation.
     """
-    try:
-        service = get_verification_service()
-        # In a real app, retrieve from DB. For now, we regenerate to get the "correct" answers
-        # This is a hack for the prototype
-        # Use submission.assessment_id to deterministically regenerate the same questions for fallback tests
-        request = MockTestRequest(user_id=submission.user_id, primary_skill="Python") # Default skill
-        assessment = await service.generate_mock_test(request, assessment_id=submission.assessment_id)
-        
-        # Override assessment ID for matching (redundant if passed above, but safe)
-        assessment.assessment_id = submission.assessment_id
-        
-        result = await service.evaluate_assessment(submission, assessment)
-        return result
-    except Exception as e:
+    return await _submit_once(submission, lambda: _grade_mock_test(submission, service))
+
+
+async def _grade_assessment(
+    submission: AssessmentSubmission,
+    service: SkillVerificationService
+) -> AssessmentResult:
+    """Grade a submission against its cached assessment."""
+    assessment = _ASSESSMENT_CACHE.get(submission.assessment_id)
+    if assessment is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error submitting mock test: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment not found or expired"
         )
+    
+    return await service.evaluate_assessment(submission, assessment)
+
+
+async def _grade_mock_test(
+    submission: AssessmentSubmission,
+    service: SkillVerificationService
+) -> AssessmentResult:
+    """Grade a mock test, regenerating it if it was never stored."""
+    assessment = await _load_assessment(submission.assessment_id, service)
+    if assessment is not None:
+        return await service.evaluate_assessment(submission, assessment)
+    
+    # Not cached or persisted (e.g. no database): template tests
+    # regenerate deterministically from the assessment_id.
+    request = _REGENERATE_REQUEST.model_copy(update={"user_id": submission.user_id})
+    assessment = await service.generate_mock_test(request, assessment_id=submission.assessment_id)
+    return await service.evaluate_assessment(submission, assessment)
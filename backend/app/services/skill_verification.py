@@ -3,12 +3,23 @@ Skill Verification Service
 Generates AI-powered assessments to verify user skills.
 """
 
+import asyncio
+import functools
+import itertools
 import logging
-from typing import List, Dict, Optional
+import random
+import threading
+from types import MappingProxyType
+from typing import Callable, List, Dict, Mapping, NamedTuple, Optional, Tuple
 import uuid
 from datetime import datetime
+import httpx
+import orjson
+from cachetools import TTLCache
+from openai import AsyncOpenAI, DEFAULT_TIMEOUT
 
 from app.config import settings
+from app.database import PostgreSQL, Assessment as AssessmentModel, User as UserModel
 from app.models.verification_models import (
     Question, QuestionType, DifficultyLevel,
     AssessmentRequest, AssessmentResponse,
@@ -19,269 +30,475 @@ from app.models.verification_models import (
 logger = logging.getLogger(__name__)
 
 
-class SkillVerificationService:
-    """
-    AI-powered skill verification through generated assessments.
-    """
-    
-    def __init__(self):
-        """Initialize verification service."""
-        # Question templates by skill
-        self.question_templates = self._load_question_templates()
-    
-    def _load_question_templates(self) -> Dict:
-        """Load question templates for different skills."""
-        return {
-            "Python": {
-                "beginner": [
-                    {
-                        "question": "What is the output of: print(type([]))?",
-                        "options": ["<class 'list'>", "<class 'dict'>", "<class 'tuple'>", "<class 'set'>"],
-                        "answer": "<class 'list'>",
-                        "explanation": "[] creates an empty list, and type() returns the class type."
-                    },
-                    {
-                        "question": "Which keyword is used to define a function in Python?",
-                        "options": ["function", "def", "func", "define"],
-                        "answer": "def",
-                        "explanation": "The 'def' keyword is used to define functions in Python."
-                    },
-                    {
-                        "question": "What is the correct file extension for Python files?",
-                        "options": [".pyth", ".pt", ".py", ".pe"],
-                        "answer": ".py",
-                        "explanation": "Python source files use the .py extension."
-                    },
-                    {
-                        "question": "How do you insert comments in Python code?",
-                        "options": ["//", "#", "/* */", "--"],
-                        "answer": "#",
-                        "explanation": "Python uses the # symbol for single-line comments."
-                    },
-                    {
-                        "question": "Which of these is NOT a core data type in Python?",
-                        "options": ["List", "Dictionary", "Tuple", "Class"],
-                        "answer": "Class",
-                        "explanation": "Class is a blueprint for objects, not a primitive/core data type like List or Tuple."
-                    },
-                    {
-                        "question": "What is the output of: 3 ** 2?",
-                        "options": ["6", "9", "5", "8"],
-                        "answer": "9",
-                        "explanation": "** is the exponentiation operator (3 to the power of 2)."
-                    }
+# Question template source data by skill; frozen into _QUESTION_TEMPLATES below
+_RAW_QUESTION_TEMPLATES: Dict[str, object] = {
+    "Python": {
+        "beginner": [
+            {
+                "question": "What is the output of: print(type([]))?",
+                "options": ["<class 'list'>", "<class 'dict'>", "<class 'tuple'>", "<class 'set'>"],
+                "answer": "<class 'list'>",
+                "explanation": "[] creates an empty list, and type() returns the class type."
+            },
+            {
+                "question": "Which keyword is used to define a function in Python?",
+                "options": ["function", "def", "func", "define"],
+                "answer": "def",
+                "explanation": "The 'def' keyword is used to define functions in Python."
+            },
+            {
+                "question": "What is the correct file extension for Python files?",
+                "options": [".pyth", ".pt", ".py", ".pe"],
+                "answer": ".py",
+                "explanation": "Python source files use the .py extension."
+            },
+            {
+                "question": "How do you insert comments in Python code?",
+                "options": ["//", "#", "/* */", "--"],
+                "answer": "#",
+                "explanation": "Python uses the # symbol for single-line comments."
+            },
+            {
+                "question": "Which of these is NOT a core data type in Python?",
+                "options": ["List", "Dictionary", "Tuple", "Class"],
+                "answer": "Class",
+                "explanation": "Class is a blueprint for objects, not a primitive/core data type like List or Tuple."
+            },
+            {
+                "question": "What is the output of: 3 ** 2?",
+                "options": ["6", "9", "5", "8"],
+                "answer": "9",
+                "explanation": "** is the exponentiation operator (3 to the power of 2)."
+            }
+        ],
+        "intermediate": [
+            {
+                "question": "What is a list comprehension in Python?",
+                "options": [
+                    "A way to create lists using a compact syntax",
+                    "A method to compress lists",
+                    "A function to understand lists",
+                    "A debugging tool"
                 ],
-                "intermediate": [
-                    {
-                        "question": "What is a list comprehension in Python?",
-                        "options": [
-                            "A way to create lists using a compact syntax",
-                            "A method to compress lists",
-                            "A function to understand lists",
-                            "A debugging tool"
-                        ],
-                        "answer": "A way to create lists using a compact syntax",
-                        "explanation": "List comprehensions provide a concise way to create lists based on existing lists."
-                    },
-                    {
-                        "question": "What is the purpose of the 'self' keyword?",
-                        "options": ["It refers to the class itself", "It refers to the instance of the class", "It is a reserved keyword for import", "It makes a variable global"],
-                        "answer": "It refers to the instance of the class",
-                        "explanation": "self represents the instance of the class and binds attributes with the given arguments."
-                    },
-                    {
-                        "question": "Which collection type is immutable?",
-                        "options": ["List", "Set", "Dictionary", "Tuple"],
-                        "answer": "Tuple",
-                        "explanation": "Tuples are immutable sequences, unlike lists or dictionaries."
-                    },
-                    {
-                        "question": "What does the *args parameter do?",
-                        "options": ["Passes keyword arguments", "Passes a variable number of non-keyword arguments", "Multiplies arguments", "Imports arguments"],
-                        "answer": "Passes a variable number of non-keyword arguments",
-                        "explanation": "*args allows you to pass a variable number of positional arguments to a function."
-                    },
-                    {
-                        "question": "How do you handle exceptions in Python?",
-                        "options": ["try-except", "do-catch", "try-catch", "catch-throw"],
-                        "answer": "try-except",
-                        "explanation": "Python uses try and except blocks to handle errors and exceptions."
-                    },
-                    {
-                        "question": "What is a decorator?",
-                        "options": ["A function that modifies the behavior of another function", "A design pattern for classes", "A UI component", "A variable type"],
-                        "answer": "A function that modifies the behavior of another function",
-                        "explanation": "Decorators allow you to wrap another function in order to extend the behavior of the wrapped function."
-                    }
+                "answer": "A way to create lists using a compact syntax",
+                "explanation": "List comprehensions provide a concise way to create lists based on existing lists."
+            },
+            {
+                "question": "What is the purpose of the 'self' keyword?",
+                "options": ["It refers to the class itself", "It refers to the instance of the class", "It is a reserved keyword for import", "It makes a variable global"],
+                "answer": "It refers to the instance of the class",
+                "explanation": "self represents the instance of the class and binds attributes with the given arguments."
+            },
+            {
+                "question": "Which collection type is immutable?",
+                "options": ["List", "Set", "Dictionary", "Tuple"],
+                "answer": "Tuple",
+                "explanation": "Tuples are immutable sequences, unlike lists or dictionaries."
+            },
+            {
+                "question": "What does the *args parameter do?",
+                "options": ["Passes keyword arguments", "Passes a variable number of non-keyword arguments", "Multiplies arguments", "Imports arguments"],
+                "answer": "Passes a variable number of non-keyword arguments",
+                "explanation": "*args allows you to pass a variable number of positional arguments to a function."
+            },
+            {
+                "question": "How do you handle exceptions in Python?",
+                "options": ["try-except", "do-catch", "try-catch", "catch-throw"],
+                "answer": "try-except",
+                "explanation": "Python uses try and except blocks to handle errors and exceptions."
+            },
+            {
+                "question": "What is a decorator?",
+                "options": ["A function that modifies the behavior of another function", "A design pattern for classes", "A UI component", "A variable type"],
+                "answer": "A function that modifies the behavior of another function",
+                "explanation": "Decorators allow you to wrap another function in order to extend the behavior of the wrapped function."
+            }
+        ],
+        "advanced": [
+            {
+                "question": "What is the difference between __str__ and __repr__?",
+                "options": [
+                    "__str__ is for end users, __repr__ is for developers",
+                    "They are the same",
+                    "__str__ is faster",
+                    "__repr__ is deprecated"
                 ],
-                "advanced": [
-                    {
-                        "question": "What is the difference between __str__ and __repr__?",
-                        "options": [
-                            "__str__ is for end users, __repr__ is for developers",
-                            "They are the same",
-                            "__str__ is faster",
-                            "__repr__ is deprecated"
-                        ],
-                        "answer": "__str__ is for end users, __repr__ is for developers",
-                        "explanation": "__str__ returns a readable string, __repr__ returns an unambiguous representation."
-                    },
-                    {
-                        "question": "What is the Global Interpreter Lock (GIL)?",
-                        "options": ["A lock that prevents multiple threads from executing bytecodes at once", "A security feature", "A database lock", "A module importer"],
-                        "answer": "A lock that prevents multiple threads from executing bytecodes at once",
-                        "explanation": "The GIL is a mutex that protects access to Python objects, preventing multiple threads from executing Python bytecodes at once."
-                    },
-                    {
-                        "question": "What is a generator in Python?",
-                        "options": ["A function that returns an iterator using 'yield'", "A tool to create lists", "A random number generator", "A compiler"],
-                        "answer": "A function that returns an iterator using 'yield'",
-                        "explanation": "Generators are functions that return an iterator and yield a sequence of values one at a time."
-                    },
-                    {
-                        "question": "What is the result of using 'is' vs '=='?",
-                        "options": ["'is' checks identity, '==' checks equality", "'is' checks equality, '==' checks identity", "They are identical", "'is' is deprecated"],
-                        "answer": "'is' checks identity, '==' checks equality",
-                        "explanation": "'is' checks if two variables point to the same object in memory, '==' checks if their values are equal."
-                    },
-                    {
-                        "question": "What is correct about Python's memory management?",
-                        "options": ["It uses manual memory management", "It uses private heap space and garbage collection", "It relies solely on OS", "It has no memory management"],
-                        "answer": "It uses private heap space and garbage collection",
-                        "explanation": "Python memory management involves a private heap containing all Python objects and data structures, managed by the Python memory manager."
-                    },
-                    {
-                        "question": "What are metaclasses?",
-                        "options": ["Classes of classes", "Special methods", "Abstract base classes", "Imported modules"],
-                        "answer": "Classes of classes",
-                        "explanation": "A metaclass is a class whose instances are classes. It defines how a class behaves."
-                    }
-                ]
+                "answer": "__str__ is for end users, __repr__ is for developers",
+                "explanation": "__str__ returns a readable string, __repr__ returns an unambiguous representation."
+            },
+            {
+                "question": "What is the Global Interpreter Lock (GIL)?",
+                "options": ["A lock that prevents multiple threads from executing bytecodes at once", "A security feature", "A database lock", "A module importer"],
+                "answer": "A lock that prevents multiple threads from executing bytecodes at once",
+                "explanation": "The GIL is a mutex that protects access to Python objects, preventing multiple threads from executing Python bytecodes at once."
+            },
+            {
+                "question": "What is a generator in Python?",
+                "options": ["A function that returns an iterator using 'yield'", "A tool to create lists", "A random number generator", "A compiler"],
+                "answer": "A function that returns an iterator using 'yield'",
+                "explanation": "Generators are functions that return an iterator and yield a sequence of values one at a time."
+            },
+            {
+                "question": "What is the result of using 'is' vs '=='?",
+                "options": ["'is' checks identity, '==' checks equality", "'is' checks equality, '==' checks identity", "They are identical", "'is' is deprecated"],
+                "answer": "'is' checks identity, '==' checks equality",
+                "explanation": "'is' checks if two variables point to the same object in memory, '==' checks if their values are equal."
+            },
+            {
+                "question": "What is correct about Python's memory management?",
+                "options": ["It uses manual memory management", "It uses private heap space and garbage collection", "It relies solely on OS", "It has no memory management"],
+                "answer": "It uses private heap space and garbage collection",
+                "explanation": "Python memory management involves a private heap containing all Python objects and data structures, managed by the Python memory manager."
             },
-            "JavaScript": {
-                "beginner": [
-                    {
-                        "question": "What does 'let' keyword do in JavaScript?",
-                        "options": [
-                            "Declares a block-scoped variable",
-                            "Declares a constant",
-                            "Declares a global variable",
-                            "Imports a module"
-                        ],
-                        "answer": "Declares a block-scoped variable",
-                        "explanation": "'let' declares a block-scoped local variable."
-                    }
+            {
+                "question": "What are metaclasses?",
+                "options": ["Classes of classes", "Special methods", "Abstract base classes", "Imported modules"],
+                "answer": "Classes of classes",
+                "explanation": "A metaclass is a class whose instances are classes. It defines how a class behaves."
+            }
+        ]
+    },
+    "JavaScript": {
+        "beginner": [
+            {
+                "question": "What does 'let' keyword do in JavaScript?",
+                "options": [
+                    "Declares a block-scoped variable",
+                    "Declares a constant",
+                    "Declares a global variable",
+                    "Imports a module"
                 ],
-                "intermediate": [
-                    {
-                        "question": "What is a closure in JavaScript?",
-                        "options": [
-                            "A function with access to outer scope",
-                            "A way to close files",
-                            "An error handling mechanism",
-                            "A loop terminator"
-                        ],
-                        "answer": "A function with access to outer scope",
-                        "explanation": "A closure gives you access to an outer function's scope from an inner function."
-                    }
+                "answer": "Declares a block-scoped variable",
+                "explanation": "'let' declares a block-scoped local variable."
+            }
+        ],
+        "intermediate": [
+            {
+                "question": "What is a closure in JavaScript?",
+                "options": [
+                    "A function with access to outer scope",
+                    "A way to close files",
+                    "An error handling mechanism",
+                    "A loop terminator"
                 ],
-                "advanced": [
-                    {
-                        "question": "What is the event loop in JavaScript?",
-                        "options": [
-                            "Mechanism for handling async operations",
-                            "A for loop variant",
-                            "An event listener",
-                            "A debugging tool"
-                        ],
-                        "answer": "Mechanism for handling async operations",
-                        "explanation": "The event loop handles asynchronous callbacks in JavaScript."
-                    }
-                ]
-            },
-            "React": {
-                "beginner": [
-                    {
-                        "question": "What is JSX in React?",
-                        "options": [
-                            "JavaScript XML syntax extension",
-                            "A CSS framework",
-                            "A testing library",
-                            "A state management tool"
-                        ],
-                        "answer": "JavaScript XML syntax extension",
-                        "explanation": "JSX is a syntax extension that allows writing HTML-like code in JavaScript."
-                    }
+                "answer": "A function with access to outer scope",
+                "explanation": "A closure gives you access to an outer function's scope from an inner function."
+            }
+        ],
+        "advanced": [
+            {
+                "question": "What is the event loop in JavaScript?",
+                "options": [
+                    "Mechanism for handling async operations",
+                    "A for loop variant",
+                    "An event listener",
+                    "A debugging tool"
                 ],
-                "intermediate": [
-                    {
-                        "question": "What is the purpose of useEffect hook?",
-                        "options": [
-                            "Handle side effects in functional components",
-                            "Create state variables",
-                            "Define component props",
-                            "Style components"
-                        ],
-                        "answer": "Handle side effects in functional components",
-                        "explanation": "useEffect is used for side effects like data fetching, subscriptions, etc."
-                    }
+                "answer": "Mechanism for handling async operations",
+                "explanation": "The event loop handles asynchronous callbacks in JavaScript."
+            }
+        ]
+    },
+    "React": {
+        "beginner": [
+            {
+                "question": "What is JSX in React?",
+                "options": [
+                    "JavaScript XML syntax extension",
+                    "A CSS framework",
+                    "A testing library",
+                    "A state management tool"
                 ],
-                "advanced": [
-                    {
-                        "question": "What is React reconciliation?",
-                        "options": [
-                            "Process of updating the DOM efficiently",
-                            "A state management pattern",
-                            "A routing mechanism",
-                            "A testing strategy"
-                        ],
-                        "answer": "Process of updating the DOM efficiently",
-                        "explanation": "Reconciliation is React's algorithm for efficiently updating the DOM."
-                    }
-                ]
-            },
-            "Aptitude": [
-                {
-                    "question": "What is the next number in the series: 2, 4, 8, 16, ...?",
-                    "options": ["30", "32", "34", "36"],
-                    "answer": "32",
-                    "explanation": "The series doubles each time."
-                },
-                {
-                    "question": "If a shirt costs $20 after a 20% discount, what was the original price?",
-                    "options": ["$22", "$24", "$25", "$30"],
-                    "answer": "$25",
-                    "explanation": "x * 0.8 = 20 => x = 20 / 0.8 = 25"
-                },
-                {
-                    "question": "Train A runs at 60km/h, Train B at 40km/h. How far apart are they after 2 hours if strictly moving away?",
-                    "options": ["100km", "200km", "150km", "50km"],
-                    "answer": "200km",
-                    "explanation": "(60 + 40) * 2 = 200km"
-                },
-                {
-                    "question": "Which word is the odd one out?",
-                    "options": ["Apple", "Banana", "Carrot", "Grape"],
-                    "answer": "Carrot",
-                    "explanation": "Carrot is a vegetable, others are fruits."
-                },
-                {
-                    "question": "Complete the series: 3, 5, 9, 17, ...",
-                    "options": ["25", "33", "35", "41"],
-                    "answer": "33",
-                    "explanation": "Difference doubles: +2, +4, +8, +16. 17+16=33."
-                },
-                {
-                    "question": "If P is the brother of Q, and Q is the sister of R, how is P related to R?",
-                    "options": ["Brother", "Sister", "Father", "Cousin"],
-                    "answer": "Brother",
-                    "explanation": "P is male (brother), so P is R's brother."
-                }
-            ]
+                "answer": "JavaScript XML syntax extension",
+                "explanation": "JSX is a syntax extension that allows writing HTML-like code in JavaScript."
+            }
+        ],
+        "intermediate": [
+            {
+                "question": "What is the purpose of useEffect hook?",
+                "options": [
+                    "Handle side effects in functional components",
+                    "Create state variables",
+                    "Define component props",
+                    "Style components"
+                ],
+                "answer": "Handle side effects in functional components",
+                "explanation": "useEffect is used for side effects like data fetching, subscriptions, etc."
+            }
+        ],
+        "advanced": [
+            {
+                "question": "What is React reconciliation?",
+                "options": [
+                    "Process of updating the DOM efficiently",
+                    "A state management pattern",
+                    "A routing mechanism",
+                    "A testing strategy"
+                ],
+                "answer": "Process of updating the DOM efficiently",
+                "explanation": "Reconciliation is React's algorithm for efficiently updating the DOM."
+            }
+        ]
+    },
+    "Aptitude": [
+        {
+            "question": "What is the next number in the series: 2, 4, 8, 16, ...?",
+            "options": ["30", "32", "34", "36"],
+            "answer": "32",
+            "explanation": "The series doubles each time."
+        },
+        {
+            "question": "If a shirt costs $20 after a 20% discount, what was the original price?",
+            "options": ["$22", "$24", "$25", "$30"],
+            "answer": "$25",
+            "explanation": "x * 0.8 = 20 => x = 20 / 0.8 = 25"
+        },
+        {
+            "question": "Train A runs at 60km/h, Train B at 40km/h. How far apart are they after 2 hours if strictly moving away?",
+            "options": ["100km", "200km", "150km", "50km"],
+            "answer": "200km",
+            "explanation": "(60 + 40) * 2 = 200km"
+        },
+        {
+            "question": "Which word is the odd one out?",
+            "options": ["Apple", "Banana", "Carrot", "Grape"],
+            "answer": "Carrot",
+            "explanation": "Carrot is a vegetable, others are fruits."
+        },
+        {
+            "question": "Complete the series: 3, 5, 9, 17, ...",
+            "options": ["25", "33", "35", "41"],
+            "answer": "33",
+            "explanation": "Difference doubles: +2, +4, +8, +16. 17+16=33."
+        },
+        {
+            "question": "If P is the brother of Q, and Q is the sister of R, how is P related to R?",
+            "options": ["Brother", "Sister", "Father", "Cousin"],
+            "answer": "Brother",
+            "explanation": "P is male (brother), so P is R's brother."
         }
-    
+    ]
+}
+
+
+class QTemplate(NamedTuple):
+    """Read-only question template."""
+    question: str
+    options: Tuple[str, ...]
+    answer: str
+    explanation: str
+
+
+def _freeze_templates(templates: List[dict]) -> Tuple[QTemplate, ...]:
+    """Convert template dicts to QTemplate tuples."""
+    return tuple(
+        QTemplate(t["question"], tuple(t["options"]), t["answer"], t["explanation"])
+        for t in templates
+    )
+
+
+# Templates are never mutated: store them as named tuples and freeze the mappings.
+# Built once and shared by every service instance.
+_QUESTION_TEMPLATES: Mapping[str, object] = MappingProxyType({
+    skill: (
+        MappingProxyType({d: _freeze_templates(ts) for d, ts in entry.items()})
+        if isinstance(entry, dict) else _freeze_templates(entry)
+    )
+    for skill, entry in _RAW_QUESTION_TEMPLATES.items()
+})
+del _RAW_QUESTION_TEMPLATES
+
+# Flat (skill, difficulty) -> templates index for single-lookup selection
+_TEMPLATE_INDEX: Dict[Tuple[str, str], Tuple[QTemplate, ...]] = {
+    (skill, difficulty): templates
+    for skill, by_difficulty in _QUESTION_TEMPLATES.items()
+    if isinstance(by_difficulty, Mapping)
+    for difficulty, templates in by_difficulty.items()
+}
+_APTITUDE_TEMPLATES: Tuple[QTemplate, ...] = _QUESTION_TEMPLATES["Aptitude"]
+
+# Standard coding challenges by ID tag, validated once; copied per assessment
+_CODING_CHALLENGES: Tuple[Tuple[str, Question], ...] = (
+    # 1. JavaScript Medium
+    ("js", Question(
+        question_id="",
+        skill="JavaScript",
+        question_text="JavaScript (Medium): Write a function 'flattenArray' that takes a nested array and returns a flat array along with its depth.",
+        question_type=QuestionType.CODING,
+        difficulty=DifficultyLevel.INTERMEDIATE,
+        correct_answer="N/A",
+        explanation="Requires recursion or stack-based flattening.",
+        points=20,
+        code_template="function flattenArray(arr) {\n    // Write your code here\n}"
+    )),
+    # 2. Python
+    ("py", Question(
+        question_id="",
+        skill="Python",
+        question_text="Python: Write a function 'process_data' that takes a list of dictionaries and returns a summary statistic (e.g., average age).",
+        question_type=QuestionType.CODING,
+        difficulty=DifficultyLevel.INTERMEDIATE,
+        correct_answer="N/A",
+        explanation="Requires list processing and aggregation.",
+        points=20,
+        code_template="def process_data(data):\n    # Write your code here\n    pass"
+    )),
+    # 3. Preferred Language / General Algo
+    ("algo", Question(
+        question_id="",
+        skill="General", # Replaced with the user's primary skill
+        question_text="Algorithmic Challenge (Preferred Language): Implement a Binary Search algorithm to find a target in a sorted array.",
+        question_type=QuestionType.CODING,
+        difficulty=DifficultyLevel.ADVANCED,
+        correct_answer="N/A",
+        explanation="Standard O(log n) search algorithm.",
+        points=30,
+        code_template="# Write your solution in your preferred language\n# Binary Search Implementation"
+    )),
+    # 4. HTML
+    ("html", Question(
+        question_id="",
+        skill="HTML",
+        question_text="HTML: Create a semantic HTML5 structure for a Blog Post containing a header, main article, and footer.",
+        question_type=QuestionType.CODING,
+        difficulty=DifficultyLevel.BEGINNER,
+        correct_answer="N/A",
+        explanation="Semantic tags like <article>, <header>, <footer>.",
+        points=15,
+        code_template="<!-- Write your HTML structure here -->\n"
+    )),
+    # 5. CSS Medium
+    ("css", Question(
+        question_id="",
+        skill="CSS",
+        question_text="CSS (Medium): Create a Flexbox layout where 3 items are evenly spaced and centered vertically in a container.",
+        question_type=QuestionType.CODING,
+        difficulty=DifficultyLevel.INTERMEDIATE,
+        correct_answer="N/A",
+        explanation="Use display: flex, justify-content: space-between, align-items: center.",
+        points=15,
+        code_template=".container {\n    /* Write your CSS here */\n}\n\n.item {\n    \n}"
+    )),
+)
+
+# Mock test template sections: (difficulty, question count, question number offset)
+_MOCK_SECTIONS: Tuple[Tuple[DifficultyLevel, int, int], ...] = (
+    (DifficultyLevel.BEGINNER, 5, 0),
+    (DifficultyLevel.INTERMEDIATE, 5, 5),
+    (DifficultyLevel.ADVANCED, 5, 10),
+)
+
+# Points per question by difficulty
+_POINTS: Dict[DifficultyLevel, int] = {
+    DifficultyLevel.BEGINNER: 10,
+    DifficultyLevel.INTERMEDIATE: 20,
+    DifficultyLevel.ADVANCED: 30,
+}
+
+@functools.lru_cache(maxsize=32)
+def _coding_challenges_for(primary_skill: str) -> Tuple[Tuple[str, Question], ...]:
+    """Coding challenges with the algorithm challenge tagged with the user's primary skill."""
+    return tuple(
+        (tag, template.model_copy(update={"skill": primary_skill}) if tag == "algo" else template)
+        for tag, template in _CODING_CHALLENGES
+    )
+
+
+# AI response strings to enums; unknown values fall back to the defaults
+_TYPE_MAP: Dict[str, QuestionType] = {
+    "multiple_choice": QuestionType.MULTIPLE_CHOICE,
+    "aptitude": QuestionType.APTITUDE,
+}
+_DIFF_MAP: Dict[str, DifficultyLevel] = {
+    "beginner": DifficultyLevel.BEGINNER,
+    "intermediate": DifficultyLevel.INTERMEDIATE,
+    "advanced": DifficultyLevel.ADVANCED,
+}
+
+def _ai_question(skill: str, q: dict) -> Question:
+    """Build a question template (no ID yet) from one raw AI question."""
+    q_type = _TYPE_MAP.get(q.get("type"), QuestionType.MULTIPLE_CHOICE)
+    return Question(
+        question_id="",
+        skill=skill if q_type != QuestionType.APTITUDE else "Aptitude",
+        question_text=q["question_text"],
+        question_type=q_type,
+        difficulty=_DIFF_MAP.get(q.get("difficulty"), DifficultyLevel.INTERMEDIATE),
+        options=q.get("options"),
+        correct_answer=q["correct_answer"],
+        explanation=q["explanation"],
+        points=q.get("points", 10 if q_type != QuestionType.APTITUDE else 5),
+        code_template=None
+    )
+
 
+# Fixed mock test composition, so its total is known up front
+_CODING_TOTAL_POINTS = sum(challenge.points for _, challenge in _CODING_CHALLENGES)
+_MOCK_APTITUDE_COUNT = min(5, len(_APTITUDE_TEMPLATES))
+_APTITUDE_POINTS = 5
+_MOCK_TEST_TOTAL_POINTS = (
+    sum(count * _POINTS[difficulty] for difficulty, count, _ in _MOCK_SECTIONS)
+    + _MOCK_APTITUDE_COUNT * _APTITUDE_POINTS
+    + _CODING_TOTAL_POINTS
+)
+
+# Grades one answer: (points, feedback, recommendation)
+Grader = Callable[[Question, str], Tuple[int, str, Optional[str]]]
+
+# Confidence bands as (minimum percentage, label, passed), highest first
+_CONFIDENCE_BANDS: Tuple[Tuple[float, str, bool], ...] = (
+    (80, "Excellent", True),
+    (60, "Good", True),
+    (0, "Needs Improvement", False),
+)
+
+# Shared OpenAI client: created on first use, closed on app shutdown
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def _get_openai() -> AsyncOpenAI:
+    """Get the shared OpenAI client, keeping connections alive across calls."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.AsyncClient(
+                timeout=DEFAULT_TIMEOUT,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+        )
+    return _openai_client
+
+
+async def close_openai_client() -> None:
+    """Close the shared OpenAI client's connection pool."""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
 
+
+# Validated AI-generated questions per skill, reused for _AI_CACHE_TTL seconds.
+# Bounded, since the skill comes straight from the client.
+_AI_CACHE_TTL = 3600
+_ai_cache: TTLCache = TTLCache(maxsize=256, ttl=_AI_CACHE_TTL)
+_ai_lock = asyncio.Lock()
+# In-flight OpenAI calls per skill, so concurrent misses share one request
+_ai_inflight: Dict[str, "asyncio.Task[Tuple[Question, ...]]"] = {}
+
+
+class SkillVerificationService:
+    """
+    AI-powered skill verification through generated assessments.
+    """
+    
+    def __init__(self):
+        """Initialize verification service."""
+        self.question_templates = _QUESTION_TEMPLATES
+        self._template_index = _TEMPLATE_INDEX
+        # Graders by question type; anything else is graded by answer match
+        self._evaluators = {QuestionType.CODING: self._grade_coding}
+    
     async def generate_assessment(self, request: AssessmentRequest) -> AssessmentResponse:
         """
         Generate a skill assessment based on request.
@@ -289,15 +506,12 @@ class SkillVerificationService:
         try:
             assessment_id = str(uuid.uuid4())
             
-            # Get templates for the skill
-            skill_templates = self.question_templates.get(
-                request.skill,
-                self.question_templates.get("Python") # Fallback to Python if skill not found
-            )
+            # Fallback to Python templates if skill not found
+            template_skill = request.skill if request.skill in self.question_templates else "Python"
             
             # Get questions based on difficulty
             questions = self._get_questions(
-                skill_templates, 
+                template_skill, 
                 request.difficulty, 
                 request.num_questions, 
                 request.skill, 
@@ -305,7 +519,7 @@ class SkillVerificationService:
                 0
             )
             
-            total_points = sum(q.points for q in questions)
+            total_points = request.num_questions * _POINTS[request.difficulty]
             
             return AssessmentResponse(
                 assessment_id=assessment_id,
@@ -316,7 +530,7 @@ class SkillVerificationService:
             )
             
         except Exception as e:
-            logger.error(f"Error generating assessment: {e}")
+            logger.error("Error generating assessment: %s", e)
             raise
 
 
@@ -331,7 +545,9 @@ class SkillVerificationService:
         - 5 Coding Challenges (JS, Python, General, HTML, CSS)
         """
         try:
-            if not assessment_id:
+            # Decide before assigning an ID below, or the AI branch never runs
+            regenerating = bool(assessment_id)
+            if not regenerating:
                 assessment_id = str(uuid.uuid4())
             
             # Try to generate with AI first (MCQs only) if key exists AND we aren't regenerating for grading
@@ -355,80 +571,103 @@ class SkillVerificationService:
             # But if passed assessment_id, we can't guarantee AI output match.
             # So grading will only work reliably for template-generated tests.
             
-            if settings.openai_api_key and not assessment_id:
+            if settings.openai_api_key and not regenerating:
                 try:
                     return await self._generate_with_ai(request, assessment_id)
                 except Exception as e:
-                    logger.error(f"AI generation failed, falling back to templates: {e}")
+                    logger.error("AI generation failed, falling back to templates: %s", e)
                     # Fallthrough to template logic below
             
-            questions = []
-            
             # Get templates
-            skill_templates = self.question_templates.get(
-                request.primary_skill,
-                self.question_templates.get("Python")
-            )
+            template_skill = request.primary_skill if request.primary_skill in self.question_templates else "Python"
             
-            # 1. 5 Easy Questions
-            easy_qs = self._get_questions(skill_templates, DifficultyLevel.BEGINNER, 5, request.primary_skill, assessment_id, 0)
-            questions.extend(easy_qs)
-            
-            # 2. 5 Intermediate Questions
-            med_qs = self._get_questions(skill_templates, DifficultyLevel.INTERMEDIATE, 5, request.primary_skill, assessment_id, 5)
-            questions.extend(med_qs)
-
-            # 3. 5 Hard Questions
-            hard_qs = self._get_questions(skill_templates, DifficultyLevel.ADVANCED, 5, request.primary_skill, assessment_id, 10)
-            questions.extend(hard_qs)
+            # 1-3. 5 Easy, 5 Intermediate and 5 Hard Questions
+            questions = list(itertools.chain.from_iterable(
+                self._get_questions(template_skill, difficulty, count, request.primary_skill, assessment_id, offset)
+                for difficulty, count, offset in _MOCK_SECTIONS
+            ))
             
             # 4. 5 Aptitude Questions
-            aptitude_pool = self.question_templates.get("Aptitude", [])
-            import random
             # Use seeded random for deterministic generation based on assessment_id
             rng = random.Random(assessment_id)
-            selected_aptitude = rng.sample(aptitude_pool, min(5, len(aptitude_pool)))
+            selected_aptitude = rng.sample(_APTITUDE_TEMPLATES, _MOCK_APTITUDE_COUNT)
+            apt_prefix = f"{assessment_id}-apt"
             
-            for i, tmpl in enumerate(selected_aptitude):
-                questions.append(Question(
-                    question_id=f"{assessment_id}-apt{i+1}",
+            questions.extend(
+                Question.model_construct(
+                    question_id=apt_prefix + str(n),
                     skill="Aptitude",
-                    question_text=tmpl["question"],
+                    question_text=tmpl.question,
                     question_type=QuestionType.APTITUDE,
                     difficulty=DifficultyLevel.INTERMEDIATE,
-                    options=tmpl.get("options", []),
-                    correct_answer=tmpl["answer"],
-                    explanation=tmpl["explanation"],
-                    points=5
-                ))
+                    options=tmpl.options,
+                    correct_answer=tmpl.answer,
+                    explanation=tmpl.explanation,
+                    points=_APTITUDE_POINTS
+                )
+                for n, tmpl in enumerate(selected_aptitude, 1)
+            )
                 
             # 5. 5 Coding Challenges (Shared Logic)
             coding_qs = self._get_coding_challenges(assessment_id, request.primary_skill)
             questions.extend(coding_qs)
             
-            total_points = sum(q.points for q in questions)
-            
-            return AssessmentResponse(
+            assessment = AssessmentResponse(
                 assessment_id=assessment_id,
                 skill=request.primary_skill,
                 questions=questions,
-                total_points=total_points,
+                total_points=_MOCK_TEST_TOTAL_POINTS,
                 time_limit_minutes=60 # Increased time for coding
             )
+            return assessment
             
         except Exception as e:
-            logger.error(f"Error generating mock test: {e}")
+            logger.error("Error generating mock test: %s", e)
             raise
 
     async def _generate_with_ai(self, request: MockTestRequest, assessment_id: str) -> AssessmentResponse:
         """Generate test using OpenAI."""
-        from openai import AsyncOpenAI
-        import json
+        ai_questions = await self._get_ai_questions(request.primary_skill)
         
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
+        prefix = f"{assessment_id}-q"
+        questions = [
+            template.model_copy(update={"question_id": prefix + str(n)})
+            for n, template in enumerate(ai_questions, 1)
+        ]
+        total_points = _CODING_TOTAL_POINTS + sum(q.points for q in questions)
+            
+        # Add 5 Standard Coding Challenges
+        coding_qs = self._get_coding_challenges(assessment_id, request.primary_skill)
+        questions.extend(coding_qs)
+        
+        return AssessmentResponse(
+            assessment_id=assessment_id,
+            skill=request.primary_skill,
+            questions=questions,
+            total_points=total_points,
+            time_limit_minutes=60
+        )
+
+    async def _get_ai_questions(self, skill: str) -> Tuple[Question, ...]:
+        """Get AI-generated questions for a skill, calling OpenAI only on a cache miss."""
+        async with _ai_lock:
+            cached = _ai_cache.get(skill)
+            if cached is not None:
+                return cached
+            task = _ai_inflight.get(skill)
+            if task is None:
+                task = asyncio.create_task(self._request_ai_questions(skill))
+                _ai_inflight[skill] = task
+                task.add_done_callback(lambda _: _ai_inflight.pop(skill, None))
         
+        return await asyncio.shield(task)
+
+    async def _request_ai_questions(self, skill: str) -> Tuple[Question, ...]:
+        """Ask OpenAI for a skill's questions, caching them once they validate."""
+        client = _get_openai()
+
         prompt = f"""
-        Generate a technical skill assessment for {request.primary_skill}.
+        Generate a technical skill assessment for {skill}.
         Return a JSON object with a list of 'questions'.
         
         Structure the test with exactly:
@@ -462,131 +701,35 @@ class SkillVerificationService:
         )
         
         content = response.choices[0].message.content
-        data = json.loads(content)
-        
-        questions = []
-        raw_qs = data.get("questions", [])
+        data = orjson.loads(content)
         
-        for i, q in enumerate(raw_qs):
-            q_type = QuestionType.MULTIPLE_CHOICE
-            if q.get("type") == "aptitude":
-                q_type = QuestionType.APTITUDE
-                
-            q_diff = DifficultyLevel.INTERMEDIATE
-            if q.get("difficulty") == "beginner":
-                q_diff = DifficultyLevel.BEGINNER
-            elif q.get("difficulty") == "advanced":
-                q_diff = DifficultyLevel.ADVANCED
-                
-            questions.append(Question(
-                question_id=f"{assessment_id}-q{i+1}",
-                skill=request.primary_skill if q_type != QuestionType.APTITUDE else "Aptitude",
-                question_text=q["question_text"],
-                question_type=q_type,
-                difficulty=q_diff,
-                options=q.get("options"),
-                correct_answer=q["correct_answer"],
-                explanation=q["explanation"],
-                points=q.get("points", 10 if q_type != QuestionType.APTITUDE else 5),
-                code_template=None
-            ))
-            
-        # Add 5 Standard Coding Challenges
-        coding_qs = self._get_coding_challenges(assessment_id, request.primary_skill)
-        questions.extend(coding_qs)
-            
-        total_points = sum(q.points for q in questions)
+        # Build before caching: a malformed completion raises here and is not reused
+        ai_questions = tuple(_ai_question(skill, q) for q in data.get("questions", []))
         
-        return AssessmentResponse(
-            assessment_id=assessment_id,
-            skill=request.primary_skill,
-            questions=questions,
-            total_points=total_points,
-            time_limit_minutes=60
-        )
+        async with _ai_lock:
+            _ai_cache[skill] = ai_questions
+        return ai_questions
 
     def _get_coding_challenges(self, assessment_id: str, primary_skill: str) -> List[Question]:
         """Generate the standard 5-section coding challenge."""
-        challenges = []
-        
-        # 1. JavaScript Medium
-        challenges.append(Question(
-            question_id=f"{assessment_id}-code-js",
-            skill="JavaScript",
-            question_text="JavaScript (Medium): Write a function 'flattenArray' that takes a nested array and returns a flat array along with its depth.",
-            question_type=QuestionType.CODING,
-            difficulty=DifficultyLevel.INTERMEDIATE,
-            correct_answer="N/A",
-            explanation="Requires recursion or stack-based flattening.",
-            points=20,
-            code_template="function flattenArray(arr) {\n    // Write your code here\n}"
-        ))
-        
-        # 2. Python
-        challenges.append(Question(
-            question_id=f"{assessment_id}-code-py",
-            skill="Python",
-            question_text="Python: Write a function 'process_data' that takes a list of dictionaries and returns a summary statistic (e.g., average age).",
-            question_type=QuestionType.CODING,
-            difficulty=DifficultyLevel.INTERMEDIATE,
-            correct_answer="N/A",
-            explanation="Requires list processing and aggregation.",
-            points=20,
-            code_template="def process_data(data):\n    # Write your code here\n    pass"
-        ))
-        
-        # 3. Preferred Language / General Algo
-        challenges.append(Question(
-            question_id=f"{assessment_id}-code-algo",
-            skill=primary_skill, # User's primary skill or General
-            question_text=f"Algorithmic Challenge (Preferred Language): Implement a Binary Search algorithm to find a target in a sorted array.",
-            question_type=QuestionType.CODING,
-            difficulty=DifficultyLevel.ADVANCED,
-            correct_answer="N/A",
-            explanation="Standard O(log n) search algorithm.",
-            points=30,
-            code_template="# Write your solution in your preferred language\n# Binary Search Implementation"
-        ))
-        
-        # 4. HTML
-        challenges.append(Question(
-            question_id=f"{assessment_id}-code-html",
-            skill="HTML",
-            question_text="HTML: Create a semantic HTML5 structure for a Blog Post containing a header, main article, and footer.",
-            question_type=QuestionType.CODING,
-            difficulty=DifficultyLevel.BEGINNER,
-            correct_answer="N/A",
-            explanation="Semantic tags like <article>, <header>, <footer>.",
-            points=15,
-            code_template="<!-- Write your HTML structure here -->\n"
-        ))
-        
-        # 5. CSS Medium
-        challenges.append(Question(
-            question_id=f"{assessment_id}-code-css",
-            skill="CSS",
-            question_text="CSS (Medium): Create a Flexbox layout where 3 items are evenly spaced and centered vertically in a container.",
-            question_type=QuestionType.CODING,
-            difficulty=DifficultyLevel.INTERMEDIATE,
-            correct_answer="N/A",
-            explanation="Use display: flex, justify-content: space-between, align-items: center.",
-            points=15,
-            code_template=".container {\n    /* Write your CSS here */\n}\n\n.item {\n    \n}"
-        ))
-        
-        return challenges
+        prefix = f"{assessment_id}-code-"
+        return [
+            template.model_copy(update={"question_id": prefix + tag})
+            for tag, template in _coding_challenges_for(primary_skill)
+        ]
 
-    def _get_questions(self, templates, difficulty, count, skill, aid, offset):
+    def _get_questions(self, template_skill, difficulty, count, skill, aid, offset):
         qs = []
-        subset = templates.get(difficulty.value, [])
+        subset = self._template_index.get((template_skill, difficulty.value), ())
+        prefix = f"{aid}-q"
         
         # If no templates for this difficulty/skill, try to populate from other difficulties if possible
         # or fall back to generic but clean format
         if not subset:
             # Fallback for genuinely missing content: generic coding questions better than "Option A"
-            for i in range(count):
+            for n in range(offset + 1, offset + count + 1):
                 qs.append(Question(
-                    question_id=f"{aid}-q{offset+i+1}",
+                    question_id=prefix + str(n),
                     skill=skill,
                     question_text=f"Concept check: Explain the core principles of {skill} related to {difficulty.value} concepts.",
                     question_type=QuestionType.MULTIPLE_CHOICE,
@@ -594,118 +737,253 @@ class SkillVerificationService:
                     options=[f"{skill} Principle A", f"{skill} Principle B", f"{skill} Principle C", "All of the above"],
                     correct_answer="All of the above",
                     explanation="Understanding core principles is key.",
-                    points=10
+                    points=_POINTS[difficulty]
                 ))
             return qs
 
             return qs
 
-        import random
         # Use seeded random for deterministic generation based on assessment_id
         rng = random.Random(aid)
         
-        available = list(subset)
-        selected_templates = []
-        
-        if count <= len(available):
-            selected_templates = rng.sample(available, count)
+        available = len(subset)
+        if count <= available:
+            selected_templates = rng.sample(subset, count)
         else:
-            # We need more than we have. Take all, then random sample for remainder
-            selected_templates.extend(available)
-            for _ in range(count - len(available)):
-                selected_templates.append(rng.choice(available))
+            # We need more than we have. Take all, then random picks for remainder
+            selected_templates = list(subset) + rng.choices(subset, k=count - available)
                 
-        for i, tmpl in enumerate(selected_templates):
-            qs.append(Question(
-                question_id=f"{aid}-q{offset+i+1}",
+        # Templates are trusted static data, so skip per-question validation
+        points = _POINTS[difficulty]
+        for n, tmpl in enumerate(selected_templates, offset + 1):
+            qs.append(Question.model_construct(
+                question_id=prefix + str(n),
                 skill=skill,
-                question_text=tmpl["question"],
+                question_text=tmpl.question,
                 question_type=QuestionType.MULTIPLE_CHOICE,
                 difficulty=difficulty,
-                options=tmpl["options"],
-                correct_answer=tmpl["answer"],
-                explanation=tmpl["explanation"],
-                points=10 if difficulty == DifficultyLevel.BEGINNER else (20 if difficulty == DifficultyLevel.INTERMEDIATE else 30)
+                options=tmpl.options,
+                correct_answer=tmpl.answer,
+                explanation=tmpl.explanation,
+                points=points
             ))
             
         return qs
 
+    def _grade_coding(self, question: Question, user_answer: str) -> Tuple[int, str, Optional[str]]:
+        """Grade a coding task: (points, feedback, recommendation)."""
+        # Basic check for non-empty code
+        if len(user_answer.strip()) > 20:
+            return question.points, "✓ Coding Task: Submitted (AI Review Pending)", None
+        return 0, "✗ Coding Task: Incomplete", f"Practice coding problems for {question.skill}"
+
+    def _grade_choice(self, question: Question, user_answer: str,
+                      expected: str) -> Tuple[int, str, Optional[str]]:
+        """
+        Grade an answer-matching question: (points, feedback, recommendation).
+        
+        ``expected`` is the question's normalized correct answer.
+        """
+        # Answers are usually the option text verbatim; only normalize on a miss
+        if user_answer == question.correct_answer or _norm(user_answer) == expected:
+            return question.points, f"✓ Question {question.question_id}: Correct!", None
+        
+        feedback = (
+            f"✗ Question {question.question_id}: Incorrect. "
+            f"Correct answer: {question.correct_answer}. "
+            f"Explanation: {question.explanation}"
+        )
+        if question.difficulty == DifficultyLevel.BEGINNER:
+            return 0, feedback, f"Review basics of {question.skill}"
+        return 0, feedback, None
+
+    async def save_assessment(self, assessment: AssessmentResponse, user_id: str,
+                              difficulty: str) -> None:
+        """
+        Persist a generated assessment so any worker can grade it later.
+        
+        Best effort, run as a background task after the response is sent:
+        generation still succeeds without a database. Guests with no users
+        row are skipped, since assessments.user_id references users.id.
+        """
+        if PostgreSQL.async_session_factory is None:
+            return
+        
+        user_uuid = _user_uuid(user_id)
+        try:
+            async with PostgreSQL.get_session_factory()() as session:
+                if await session.get(UserModel, user_uuid) is None:
+                    logger.debug("Not persisting assessment %s: no user %s",
+                                 assessment.assessment_id, user_id)
+                    return
+                session.add(AssessmentModel(
+                    id=uuid.UUID(assessment.assessment_id),
+                    user_id=user_uuid,
+                    skill=assessment.skill,
+                    difficulty=difficulty,
+                    questions=[q.model_dump(mode="json") for q in assessment.questions],
+                    total_points=assessment.total_points,
+                    time_limit_minutes=assessment.time_limit_minutes
+                ))
+                await session.commit()
+        except Exception as e:
+            logger.warning("Could not persist assessment %s: %s", assessment.assessment_id, e)
+
+    async def get_assessment(self, assessment_id: str) -> Optional[AssessmentResponse]:
+        """
+        Load a persisted assessment by ID.
+        
+        Returns None if it was never stored or the database is unavailable.
+        """
+        if PostgreSQL.async_session_factory is None:
+            return None
+        
+        try:
+            record_id = uuid.UUID(assessment_id)
+        except ValueError:
+            return None
+        
+        try:
+            async with PostgreSQL.get_session_factory()() as session:
+                record = await session.get(AssessmentModel, record_id)
+        except Exception as e:
+            logger.warning("Could not load assessment %s: %s", assessment_id, e)
+            return None
+        
+        if record is None:
+            return None
+        return AssessmentResponse(
+            assessment_id=assessment_id,
+            skill=record.skill,
+            questions=record.questions,
+            total_points=record.total_points,
+            time_limit_minutes=record.time_limit_minutes,
+            created_at=record.created_at
+        )
+
     async def evaluate_assessment(self, submission: AssessmentSubmission, 
                                   assessment: AssessmentResponse) -> AssessmentResult:
         """
         Evaluate user's assessment submission.
         """
-        try:
-            score = 0
-            max_score = assessment.total_points
-            feedback = []
-            recommendations = []
-            
-            # Create answer map
-            answer_map = {ans.question_id: ans.user_answer for ans in submission.answers}
-            
-            # Evaluate each question
-            for question in assessment.questions:
-                user_answer = answer_map.get(question.question_id, "")
-                
-                if question.question_type == QuestionType.CODING:
-                    # Basic check for non-empty code
-                    if len(user_answer.strip()) > 20:
-                        score += question.points
-                        feedback.append(f"✓ Coding Task: Submitted (AI Review Pending)")
-                    else:
-                        feedback.append(f"✗ Coding Task: Incomplete")
-                        recommendations.append(f"Practice coding problems for {question.skill}")
-                else:
-                    if user_answer.strip().lower() == question.correct_answer.strip().lower():
-                        score += question.points
-                        feedback.append(f"✓ Question {question.question_id}: Correct!")
-                    else:
-                        feedback.append(
-                            f"✗ Question {question.question_id}: Incorrect. "
-                            f"Correct answer: {question.correct_answer}. "
-                            f"Explanation: {question.explanation}"
-                        )
-                        if question.difficulty == DifficultyLevel.BEGINNER:
-                            recommendations.append(f"Review basics of {question.skill}")
-            
-            percentage = (score / max_score * 100) if max_score > 0 else 0
-            
-            # Determine confidence level
-            if percentage >= 80:
-                confidence = "Excellent"
-                passed = True
-            elif percentage >= 60:
-                confidence = "Good"
-                passed = True
-            else:
-                confidence = "Needs Improvement"
-                passed = False
-            
-            return AssessmentResult(
-                assessment_id=submission.assessment_id,
-                user_id=submission.user_id,
-                skill=assessment.skill,
-                score=score,
-                max_score=max_score,
-                percentage=round(percentage, 1),
-                confidence_level=confidence,
-                passed=passed,
-                feedback=feedback,
-                recommendations=list(set(recommendations))
+        answer_map = self.prepare_evaluation(submission)
+        # Grading takes tens of microseconds; a thread hop would cost more
+        return self.score_assessment(submission, answer_map, assessment)
+
+    def prepare_evaluation(self, submission: AssessmentSubmission) -> Dict[str, str]:
+        """
+        Index submitted answers by question ID.
+        
+        Duplicate answers for a question collapse to the last one, so they
+        are never graded or counted twice.
+        """
+        return {ans.question_id: ans.user_answer for ans in submission.answers}
+
+    def _graders_for(self, assessment: AssessmentResponse) -> Tuple[Grader, ...]:
+        """
+        Per-question graders in question order, built once and cached on the assessment.
+        
+        Each question's type dispatch is resolved up front, and answer-matched
+        questions get their normalized correct answer bound. Graders line up
+        with ``assessment.questions`` by position.
+        """
+        graders = assessment._graders
+        if graders is None:
+            evaluators = self._evaluators
+            grade_choice = self._grade_choice
+            graders = tuple(
+                evaluators.get(q.question_type)
+                or functools.partial(grade_choice, expected=_norm(q.correct_answer))
+                for q in assessment.questions
             )
+            assessment._graders = graders
+        return graders
+
+    def score_assessment(self, submission: AssessmentSubmission,
+                         answer_map: Dict[str, str],
+                         assessment: AssessmentResponse) -> AssessmentResult:
+        """
+        Score prepared answers against the assessment.
+        
+        Synchronous and CPU-bound; async callers should run it in a worker
+        thread rather than on the event loop.
+        """
+        score = 0
+        max_score = assessment.total_points
+        feedback = []
+        recommendations = []
+        seen_recommendations = set()
+        
+        if not any(answer.strip() for answer in answer_map.values()):
+            # Nothing to grade (e.g. an accidental submit): skip the question pass
+            feedback.append("No answers submitted")
+        else:
+            get_answer = answer_map.get
             
-        except Exception as e:
-            logger.error(f"Error evaluating assessment: {e}")
-            raise
+            # Evaluate each question with its prebuilt grader
+            try:
+                for question, grade in zip(assessment.questions, self._graders_for(assessment)):
+                    points, message, recommendation = grade(question, get_answer(question.question_id, ""))
+                    score += points
+                    feedback.append(message)
+                    # Dedupe as we go, keeping first-seen order
+                    if recommendation and recommendation not in seen_recommendations:
+                        seen_recommendations.add(recommendation)
+                        recommendations.append(recommendation)
+            except Exception:
+                logger.exception("Error evaluating assessment %s", submission.assessment_id)
+                raise
+        
+        percentage, confidence, passed = _classify(score, max_score)
+        
+        return AssessmentResult(
+            assessment_id=submission.assessment_id,
+            user_id=submission.user_id,
+            skill=assessment.skill,
+            score=score,
+            max_score=max_score,
+            percentage=percentage,
+            confidence_level=confidence,
+            passed=passed,
+            feedback=feedback,
+            recommendations=recommendations
+        )
+
+
+@functools.lru_cache(maxsize=4096)
+def _classify(score: int, max_score: int) -> Tuple[float, str, bool]:
+    """Rounded percentage, confidence label and pass flag for a score."""
+    percentage = (score / max_score * 100) if max_score > 0 else 0
+    confidence, passed = next(
+        (label, band_passed) for threshold, label, band_passed in _CONFIDENCE_BANDS
+        if percentage >= threshold
+    )
+    return round(percentage, 1), confidence, passed
+
+
+def _user_uuid(user_id: str) -> uuid.UUID:
+    """Map a user ID to a UUID, deriving a stable one for non-UUID IDs."""
+    try:
+        return uuid.UUID(user_id)
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_DNS, user_id)
+
+
+def _norm(answer: str) -> str:
+    """Normalize an answer for comparison: trimmed and casefolded."""
+    return answer.strip().casefold()
 
 
 # Singleton instance
 _verification_service = None
+_verification_service_lock = threading.Lock()
 
 def get_verification_service() -> SkillVerificationService:
     """Get singleton instance of verification service."""
     global _verification_service
     if _verification_service is None:
-        _verification_service = SkillVerificationService()
+        # Double-checked: worker threads must not each build a service
+        with _verification_service_lock:
+            if _verification_service is None:
+                _verification_service = SkillVerificationService()
     return _verification_service
@@ -3,13 +3,49 @@ Comprehensive test suite for SkillLens backend.
 Tests all major services and API endpoints.
 """
 
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
 import pytest
+from cachetools import TTLCache
 from fastapi.testclient import TestClient
+from app.config import settings
 from app.main import app
 
 client = TestClient(app)
 
 
+_OTP_QUESTION = {
+    "question_text": "What does OTP stand for in Elixir?",
+    "options": ["Open Telecom Platform", "One Time Password"],
+    "correct_answer": "Open Telecom Platform",
+    "explanation": "OTP is Erlang's Open Telecom Platform.",
+    "difficulty": "beginner",
+    "type": "multiple_choice"
+}
+
+
+def _stub_openai(monkeypatch, skill_verification, questions=(_OTP_QUESTION,)):
+    """Route AI generation to a fake OpenAI client; returns its recorded calls."""
+    calls = []
+    content = json.dumps({"questions": list(questions)})
+    
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0)  # Yield, as a real request would
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(skill_verification.settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(skill_verification, "_get_openai", lambda: fake_client)
+    monkeypatch.setattr(skill_verification, "_ai_cache", TTLCache(maxsize=8, ttl=60))
+    return calls
+
+
 class TestHealthEndpoints:
     """Test health check endpoints for all services."""
     
@@ -52,6 +88,24 @@ class TestHealthEndpoints:
         assert response.status_code == 200
 
 
+class TestErrorHandling:
+    """Test global error handling."""
+    
+    def test_server_error_keeps_cors_headers(self):
+        """Test that unhandled errors return a 500 the frontend can read."""
+        def fail():
+            raise RuntimeError("boom")
+        app.add_api_route("/_test/error", fail)
+        try:
+            origin = settings.cors_origins_list[0]
+            response = client.get("/_test/error", headers={"Origin": origin})
+        finally:
+            app.router.routes.pop()
+        assert response.status_code == 500
+        assert "detail" in response.json()
+        assert response.headers["access-control-allow-origin"] == origin
+
+
 class TestAIAgent:
     """Test AI agent functionality."""
     
@@ -104,6 +158,269 @@ class TestVerification:
         assert "assessment_id" in data
         assert len(data["questions"]) == 5
 
+    def test_submit_assessment(self):
+        """Test grading against the generated assessment."""
+        payload = {
+            "user_id": "test_user",
+            "skill": "Python",
+            "difficulty": "beginner",
+            "num_questions": 3
+        }
+        assessment = client.post("/api/verification/generate-assessment", json=payload).json()
+        submission = {
+            "assessment_id": assessment["assessment_id"],
+            "user_id": "test_user",
+            "answers": [
+                {"question_id": q["question_id"], "user_answer": q["correct_answer"]}
+                for q in assessment["questions"]
+            ]
+        }
+        response = client.post("/api/verification/submit-assessment", json=submission)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["score"] == data["max_score"]
+        assert data["passed"]
+
+    def test_submit_duplicate_answers(self):
+        """Test that repeated answers for a question are graded once."""
+        payload = {
+            "user_id": "test_user",
+            "skill": "Python",
+            "difficulty": "beginner",
+            "num_questions": 2
+        }
+        assessment = client.post("/api/verification/generate-assessment", json=payload).json()
+        question = assessment["questions"][0]
+        answers = [
+            {"question_id": question["question_id"], "user_answer": question["correct_answer"]}
+        ] * 3
+        submission = {
+            "assessment_id": assessment["assessment_id"],
+            "user_id": "test_user",
+            "answers": answers
+        }
+        response = client.post("/api/verification/submit-assessment", json=submission)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["score"] == question["points"]
+        assert len(data["feedback"]) == len(assessment["questions"])
+
+    def test_resubmission_returns_first_result(self):
+        """Test that a retried submission gets the originally graded result."""
+        payload = {
+            "user_id": "test_user",
+            "skill": "Python",
+            "difficulty": "beginner",
+            "num_questions": 3
+        }
+        assessment = client.post("/api/verification/generate-assessment", json=payload).json()
+        submission = {
+            "assessment_id": assessment["assessment_id"],
+            "user_id": "test_user",
+            "answers": [
+                {"question_id": q["question_id"], "user_answer": q["correct_answer"]}
+                for q in assessment["questions"]
+            ]
+        }
+        first = client.post("/api/verification/submit-assessment", json=submission)
+        for answer in submission["answers"]:
+            answer["user_answer"] = "wrong"
+        retry = client.post("/api/verification/submit-assessment", json=submission)
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.json()["score"] == retry.json()["max_score"]
+
+    def test_generate_assessment_batch(self):
+        """Test batch generation returns distinct, gradeable assessments."""
+        payload = {
+            "user_id": "test_user",
+            "skill": "Python",
+            "difficulty": "beginner",
+            "num_questions": 2
+        }
+        response = client.post("/api/verification/generate-assessment/batch", json=[payload] * 3)
+        assert response.status_code == 200
+        assessments = response.json()
+        assert len(assessments) == 3
+        assert len({a["assessment_id"] for a in assessments}) == 3
+        
+        for assessment in assessments:
+            submission = {
+                "assessment_id": assessment["assessment_id"],
+                "user_id": "test_user",
+                "answers": [
+                    {"question_id": q["question_id"], "user_answer": q["correct_answer"]}
+                    for q in assessment["questions"]
+                ]
+            }
+            result = client.post("/api/verification/submit-assessment", json=submission)
+            assert result.status_code == 200
+            assert result.json()["score"] == assessment["total_points"]
+
+    def test_generate_assessment_batch_bounds(self):
+        """Test that empty and oversized batches are rejected."""
+        from app.routers.verification import MAX_BATCH_ASSESSMENTS
+        
+        payload = {"user_id": "test_user", "skill": "Python", "num_questions": 1}
+        url = "/api/verification/generate-assessment/batch"
+        assert client.post(url, json=[]).status_code == 422
+        oversized = [payload] * (MAX_BATCH_ASSESSMENTS + 1)
+        assert client.post(url, json=oversized).status_code == 422
+
+    def test_submit_empty_answers(self):
+        """Test that submitting with nothing answered scores zero."""
+        payload = {"user_id": "test_user", "primary_skill": "Python"}
+        mock_test = client.post("/api/verification/mock-test/generate", json=payload).json()
+        submission = {
+            "assessment_id": mock_test["assessment_id"],
+            "user_id": "test_user",
+            "answers": []
+        }
+        response = client.post("/api/verification/mock-test/submit", json=submission)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["score"] == 0
+        assert data["feedback"] == ["No answers submitted"]
+
+    def test_submit_unknown_assessment(self):
+        """Test submitting answers for an unknown assessment."""
+        submission = {
+            "assessment_id": "unknown",
+            "user_id": "test_user",
+            "answers": [{"question_id": "unknown-q1", "user_answer": "def"}]
+        }
+        response = client.post("/api/verification/submit-assessment", json=submission)
+        assert response.status_code == 404
+
+    def test_assessment_persisted_for_registered_user(self, monkeypatch):
+        """Test that a user's assessment is stored and graded after eviction."""
+        from app.database import PostgreSQL
+        from app.routers import verification
+        
+        user_id = "7f1c2a9e-5b1d-4c3e-9a8f-2d6b0e4c1a37"
+        stored = {uuid.UUID(user_id): SimpleNamespace(id=uuid.UUID(user_id))}
+        
+        class FakeSession:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc_info):
+                return False
+            
+            def add(self, record):
+                self.record = record
+            
+            async def commit(self):
+                self.record.created_at = datetime.now(timezone.utc)
+                stored[self.record.id] = self.record
+            
+            async def get(self, model, record_id):
+                return stored.get(record_id)
+        
+        monkeypatch.setattr(PostgreSQL, "async_session_factory", FakeSession)
+        payload = {
+            "user_id": user_id,
+            "skill": "Python",
+            "difficulty": "beginner",
+            "num_questions": 3
+        }
+        
+        # Guests have no users row, so their assessments are not stored
+        client.post("/api/verification/generate-assessment", json={**payload, "user_id": "test-user"})
+        assert len(stored) == 1
+        
+        assessment = client.post("/api/verification/generate-assessment", json=payload).json()
+        assert uuid.UUID(assessment["assessment_id"]) in stored
+        
+        # Simulate another worker: only the database knows the assessment
+        verification._ASSESSMENT_CACHE.pop(assessment["assessment_id"])
+        submission = {
+            "assessment_id": assessment["assessment_id"],
+            "user_id": user_id,
+            "answers": [
+                {"question_id": q["question_id"], "user_answer": q["correct_answer"]}
+                for q in assessment["questions"]
+            ]
+        }
+        response = client.post("/api/verification/submit-assessment", json=submission)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["score"] == data["max_score"] == assessment["total_points"]
+
+    def test_submit_mock_test(self):
+        """Test grading a generated mock test."""
+        payload = {"user_id": "test_user", "primary_skill": "Python"}
+        mock_test = client.post("/api/verification/mock-test/generate", json=payload).json()
+        submission = {
+            "assessment_id": mock_test["assessment_id"],
+            "user_id": "test_user",
+            "answers": [
+                {"question_id": q["question_id"], "user_answer": q["correct_answer"]}
+                for q in mock_test["questions"]
+                if q["question_type"] != "coding"
+            ]
+        }
+        response = client.post("/api/verification/mock-test/submit", json=submission)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["max_score"] == mock_test["total_points"]
+        assert 0 < data["score"] < data["max_score"]
+
+    def test_generate_mock_test_with_ai(self, monkeypatch):
+        """Test AI mock-test generation, reusing the cached OpenAI response."""
+        from app.services import skill_verification
+        
+        calls = _stub_openai(monkeypatch, skill_verification)
+        
+        payload = {"user_id": "test_user", "primary_skill": "Elixir"}
+        first = client.post("/api/verification/mock-test/generate", json=payload).json()
+        second = client.post("/api/verification/mock-test/generate", json=payload).json()
+        assert len(calls) == 1
+        assert first["assessment_id"] != second["assessment_id"]
+        assert first["questions"][0]["question_text"] == "What does OTP stand for in Elixir?"
+        
+        question = first["questions"][0]
+        submission = {
+            "assessment_id": first["assessment_id"],
+            "user_id": "test_user",
+            "answers": [{"question_id": question["question_id"], "user_answer": question["correct_answer"]}]
+        }
+        response = client.post("/api/verification/mock-test/submit", json=submission)
+        assert response.status_code == 200
+        assert response.json()["score"] == question["points"]
+
+    def test_malformed_ai_response_not_cached(self, monkeypatch):
+        """Test that an unusable AI response falls back to templates and is retried."""
+        from app.services import skill_verification
+        
+        malformed = {k: v for k, v in _OTP_QUESTION.items() if k != "correct_answer"}
+        calls = _stub_openai(monkeypatch, skill_verification, questions=[malformed])
+        
+        payload = {"user_id": "test_user", "primary_skill": "Elixir"}
+        for _ in range(2):
+            response = client.post("/api/verification/mock-test/generate", json=payload)
+            assert response.status_code == 200
+            texts = [q["question_text"] for q in response.json()["questions"]]
+            assert _OTP_QUESTION["question_text"] not in texts
+        assert len(calls) == 2
+        assert "Elixir" not in skill_verification._ai_cache
+
+    def test_concurrent_ai_generations_share_one_call(self, monkeypatch):
+        """Test that concurrent AI mock-test misses share one OpenAI call."""
+        from app.services import skill_verification
+        
+        calls = _stub_openai(monkeypatch, skill_verification)
+        service = skill_verification.get_verification_service()
+        request = skill_verification.MockTestRequest(user_id="test_user", primary_skill="Elixir")
+        
+        async def generate_many():
+            return await asyncio.gather(*(service.generate_mock_test(request) for _ in range(5)))
+        
+        tests = asyncio.run(generate_many())
+        assert len(calls) == 1
+        assert len({t.assessment_id for t in tests}) == 5
+        assert not skill_verification._ai_inflight
+
 
 class TestJobs:
     """Test job market intelligence."""